@@ -1,9 +1,13 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 import os
 from supabase import create_client, Client
 from dotenv import load_dotenv
+from services.cache import shared_cache
+from services.snapshot import iter_session_snapshot, import_session_snapshot
+from services.warmup import warm_session, warmup_status, drop_session
 
 load_dotenv()
 
@@ -50,9 +54,12 @@ async def create_session(session: SessionCreate):
         raise HTTPException(status_code=500, detail=f"Failed to create session: {str(e)}")
 
 @router.get("/sessions/{session_id}")
-async def get_session(session_id: int):
+async def get_session(session_id: int, background_tasks: BackgroundTasks):
     """
-    Get a specific session with its documents
+    Get a specific session with its documents.
+    Opening a session (StudySession does this on mount) also preloads it in
+    the background into the host-wide shared cache, so the first query is
+    served without a match_documents scan by whichever worker receives it.
     """
     try:
         # Get session info
@@ -67,12 +74,29 @@ async def get_session(session_id: int):
         session = session_response.data[0]
         session["documents"] = docs_response.data
         
+        background_tasks.add_task(warm_session, session_id)
+        
         return {"session": session}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch session: {str(e)}")
 
+@router.get("/sessions/{session_id}/warmup")
+async def get_session_warmup(session_id: int):
+    """
+    Report whether a session is preloaded in the shared cache
+    """
+    return warmup_status(session_id)
+
+@router.delete("/sessions/{session_id}/warmup")
+async def drop_session_warmup(session_id: int):
+    """
+    Make a session cold in every worker (drops its preload and cached results)
+    """
+    drop_session(session_id)
+    return {"message": "Session warm-up dropped"}
+
 @router.put("/sessions/{session_id}")
 async def update_session(session_id: int, session: SessionUpdate):
     """
@@ -109,9 +133,52 @@ async def delete_session(session_id: int):
         
         if not response.data:
             raise HTTPException(status_code=404, detail="Session not found")
+        shared_cache.invalidate_session(session_id)
         
         return {"message": "Session deleted successfully"}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete session: {str(e)}")
+
+@router.get("/sessions/{session_id}/export")
+async def export_session(session_id: int):
+    """
+    Stream a binary snapshot of a session's documents and embeddings
+    """
+    try:
+        session_response = supabase.table("sessions").select("*").eq("id", session_id).execute()
+        
+        if not session_response.data:
+            raise HTTPException(status_code=404, detail="Session not found")
+        
+        return StreamingResponse(
+            iter_session_snapshot(session_response.data[0]),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="session-{session_id}.snapshot"'},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to export session: {str(e)}")
+
+@router.post("/sessions/{session_id}/import")
+async def import_session(session_id: int, request: Request):
+    """
+    Restore documents from a snapshot into a session without re-embedding
+    """
+    try:
+        session_response = supabase.table("sessions").select("id").eq("id", session_id).execute()
+        
+        if not session_response.data:
+            raise HTTPException(status_code=404, detail="Session not found")
+        
+        result = await import_session_snapshot(request.stream(), session_id)
+        shared_cache.invalidate_session(session_id)
+        return {"session_id": session_id, **result}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to import session: {str(e)}")
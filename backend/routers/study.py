@@ -1,8 +1,10 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Response
 from pydantic import BaseModel
-from services.ingestion import process_pdf, chunk_text
-from services.rag import store_embeddings, query_documents, openai_client
+from services.ingestion import process_pdf, chunk_text, extract_pdf_pages, chunk_pages
+from services.rag import store_embeddings, sync_embeddings, query_documents, openai_client
+from services.cache import shared_cache
 from typing import Optional
+import time
 
 router = APIRouter()
 
@@ -11,20 +13,48 @@ class ChatRequest(BaseModel):
     session_id: Optional[int] = None
 
 @router.post("/upload")
-async def upload_file(file: UploadFile = File(...), session_id: int = Query(..., description="Session ID to upload to")):
+async def upload_file(
+    file: UploadFile = File(...),
+    session_id: int = Query(..., description="Session ID to upload to"),
+    incremental: bool = Query(False, description="Replace a previous upload of this file, re-embedding only changed chunks. Chunks per page, so short pages give smaller chunks"),
+):
     if file.filename.endswith(".pdf"):
+        if incremental:
+            # Per-page chunks let an edit touch only the chunks of its page
+            pages = await extract_pdf_pages(file)
+            chunks = chunk_pages(pages)
+            if not chunks:
+                # Syncing nothing would delete every stored chunk of the previous version
+                raise HTTPException(status_code=400, detail="No text could be extracted from the PDF; the stored version was left unchanged.")
+            # Diff against the stored version of this file and embed only what changed
+            result = await sync_embeddings(file.filename, chunks, session_id=session_id)
+            shared_cache.invalidate_session(session_id)
+            return {
+                "filename": file.filename,
+                "chunks_processed": len(chunks),
+                "chunks_reused": result["reused"],
+                "chunks_added": result["added"],
+                "chunks_removed": result["removed"],
+                "chunking": "page",
+                "status": "success",
+                "session_id": session_id,
+            }
         text = await process_pdf(file)
         chunks = chunk_text(text)
         # Store in DB with session_id
         await store_embeddings(file.filename, chunks, session_id=session_id)
+        shared_cache.invalidate_session(session_id)
         return {"filename": file.filename, "chunks_processed": len(chunks), "status": "success", "session_id": session_id}
     else:
         raise HTTPException(status_code=400, detail="Only PDF files are supported currently.")
 
 @router.post("/chat")
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_response: Response):
     # Context retrieval with session filtering
+    started = time.perf_counter()
     relevant_docs = await query_documents(request.message, session_id=request.session_id)
+    # Lets clients (e.g. tests/bench_warmup.py) see retrieval time without the completion
+    http_response.headers["Server-Timing"] = f"retrieval;dur={(time.perf_counter() - started) * 1000:.1f}"
     
     # Check if we found any relevant documents
     if not relevant_docs or len(relevant_docs) == 0:
@@ -79,7 +109,14 @@ Remember: Your job is to help students understand THEIR materials, not to provid
 async def summarize(request: ChatRequest):
     """
     Summarize documents from the session.
+    Summaries are cached per session until new documents are uploaded.
     """
+    if request.session_id is not None:
+        version = shared_cache.session_version(request.session_id)
+        cached = shared_cache.get("summary", "summary", session_id=request.session_id)
+        if cached is not None:
+            return {"summary": cached}
+    
     # Get documents from the session
     relevant_docs = await query_documents("summarize all content", match_threshold=0.2, match_count=10, session_id=request.session_id)
     
@@ -96,7 +133,10 @@ async def summarize(request: ChatRequest):
             {"role": "user", "content": f"Please summarize the following content:\n\n{context[:4000]}"}
         ]
     )
-    return {"summary": response.choices[0].message.content}
+    summary = response.choices[0].message.content
+    if request.session_id is not None:
+        shared_cache.set("summary", "summary", summary, session_id=request.session_id, version=version)
+    return {"summary": summary}
 
 @router.post("/flashcards")
 async def generate_flashcards(request: ChatRequest):
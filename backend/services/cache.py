@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import tempfile
+import threading
+import logging
+from typing import Any, Optional
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Shared by every uvicorn worker on the host; lives outside the repo by default
+CACHE_PATH = os.environ.get("CACHE_PATH", os.path.join(tempfile.gettempdir(), "study_buddy_cache.sqlite3"))
+CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# A hit refreshes an entry's position in the eviction order at most this often,
+# so hot entries do not turn every read into a write
+CACHE_TOUCH_SECONDS = float(os.environ.get("CACHE_TOUCH_SECONDS", "30"))
+
+# Sessionless entries (e.g. embeddings of a text) are never invalidated
+GLOBAL_SCOPE = 0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    session_id INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,  -- last stored or read (throttled), drives LRU eviction
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_stored_at ON entries (stored_at);
+CREATE INDEX IF NOT EXISTS entries_session ON entries (session_id);
+CREATE TABLE IF NOT EXISTS versions (
+    session_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stats (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    total_bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO stats (id, total_bytes) VALUES (1, 0);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    UPDATE stats SET total_bytes = total_bytes + NEW.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE stats SET total_bytes = total_bytes - OLD.size WHERE id = 1;
+END;
+"""
+
+class SharedCache:
+    """
+    Host-wide cache shared by all worker processes, backed by a memory-mapped
+    SQLite file in WAL mode. Reads are plain SELECTs and never wait on
+    writers; writes take SQLite's single writer lock.
+
+    Session-scoped entries are stamped with the session's version. Bumping the
+    version in invalidate_session() makes them invisible to every worker at
+    once. Once the stored values exceed max_bytes the least recently used
+    entries are evicted.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES, touch_seconds: float = CACHE_TOUCH_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.touch_seconds = touch_seconds
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread and per process (never reuse across a fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA mmap_size={self.max_bytes * 2}")
+        conn.executescript(SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """
+        Builds a fixed-size key from arbitrary JSON-serialisable parts.
+        """
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, namespace: str, key: str, session_id: Optional[int] = None) -> Optional[Any]:
+        scope = GLOBAL_SCOPE if session_id is None else session_id
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                """
+                SELECT e.value, e.stored_at FROM entries e
+                LEFT JOIN versions v ON v.session_id = e.session_id
+                WHERE e.namespace = ? AND e.key = ? AND e.session_id = ?
+                  AND e.version = COALESCE(v.version, 0)
+                """,
+                (namespace, key, scope),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache read failed: {e}")
+            return None
+        if row is None:
+            return None
+        value, stored_at = row
+        if time.time() - stored_at >= self.touch_seconds:
+            self._touch(conn, namespace, key)
+        return json.loads(value)
+
+    def _touch(self, conn: sqlite3.Connection, namespace: str, key: str) -> None:
+        """
+        Marks an entry as recently used. Best effort: skipped instead of
+        waiting when another worker holds the write lock.
+        """
+        try:
+            conn.execute("PRAGMA busy_timeout=0")
+            conn.execute("UPDATE entries SET stored_at = ? WHERE namespace = ? AND key = ?", (time.time(), namespace, key))
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            conn.execute("PRAGMA busy_timeout=5000")
+
+    def set(self, namespace: str, key: str, value: Any, session_id: Optional[int] = None, version: Optional[int] = None) -> None:
+        """
+        Stores a value. Pass the session_version() read before computing the
+        value so a result computed across an invalidation is not cached.
+        """
+        scope = GLOBAL_SCOPE if session_id is None else session_id
+        payload = json.dumps(value)
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT version FROM versions WHERE session_id = ?", (scope,)).fetchone()
+                current = row[0] if row else 0
+                if version is not None and version != current:
+                    conn.execute("ROLLBACK")
+                    return
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                conn.execute(
+                    "INSERT INTO entries (namespace, key, session_id, version, value, size, stored_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (namespace, key, scope, current, payload, size, time.time()),
+                )
+                self._evict(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache write failed: {e}")
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        (total,) = conn.execute("SELECT total_bytes FROM stats WHERE id = 1").fetchone()
+        if total <= self.max_bytes:
+            return
+        # Evict least recently used entries down to 90% of the budget to avoid evicting on every write
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        stale = []
+        for key_namespace, key, size in conn.execute("SELECT namespace, key, size FROM entries ORDER BY stored_at"):
+            stale.append((key_namespace, key))
+            freed += size
+            if freed >= target:
+                break
+        conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", stale)
+        logger.info(f"Shared cache evicted {len(stale)} entries ({freed} bytes)")
+
+    def session_version(self, session_id: int) -> int:
+        try:
+            row = self._connection().execute("SELECT version FROM versions WHERE session_id = ?", (session_id,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache read failed: {e}")
+            return -1
+        return row[0] if row else 0
+
+    def invalidate_session(self, session_id: int) -> None:
+        """
+        Drops every cached entry of a session for all workers.
+        """
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT INTO versions (session_id, version) VALUES (?, 1) "
+                    "ON CONFLICT(session_id) DO UPDATE SET version = version + 1",
+                    (session_id,),
+                )
+                conn.execute("DELETE FROM entries WHERE session_id = ?", (session_id,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            logger.info(f"Shared cache invalidated session_id: {session_id}")
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache invalidation failed: {e}")
+
+shared_cache = SharedCache()
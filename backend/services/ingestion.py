@@ -1,5 +1,7 @@
 from fastapi import UploadFile
 from pypdf import PdfReader
+from typing import List
+import hashlib
 import io
 import logging
 
@@ -7,9 +9,15 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def process_pdf(file: UploadFile):
+def hash_text(text: str) -> str:
     """
-    Reads a PDF file and extracts text.
+    Returns a stable content hash used to detect unchanged pages and chunks.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+async def extract_pdf_pages(file: UploadFile) -> List[str]:
+    """
+    Reads a PDF file and extracts the text of each page.
     """
     try:
         logger.info(f"Processing PDF: {file.filename}")
@@ -19,11 +27,24 @@ async def process_pdf(file: UploadFile):
         reader = PdfReader(io.BytesIO(content))
         logger.info(f"Number of pages: {len(reader.pages)}")
         
-        text = ""
+        pages = []
         for i, page in enumerate(reader.pages):
-            page_text = page.extract_text()
+            page_text = page.extract_text() or ""
             logger.info(f"Page {i+1} extracted {len(page_text)} characters")
-            text += page_text + "\n"
+            pages.append(page_text)
+        
+        return pages
+    except Exception as e:
+        logger.error(f"Error processing PDF: {str(e)}", exc_info=True)
+        raise
+
+async def process_pdf(file: UploadFile):
+    """
+    Reads a PDF file and extracts text.
+    """
+    try:
+        pages = await extract_pdf_pages(file)
+        text = "".join(page_text + "\n" for page_text in pages)
         
         logger.info(f"Total text extracted: {len(text)} characters")
         
@@ -52,3 +73,25 @@ def chunk_text(text: str, chunk_size: int = 1000):
     
     logger.info(f"Created {len(chunks)} chunks from text")
     return chunks
+
+def chunk_pages(pages: List[str], chunk_size: int = 1000):
+    """
+    Splits each page into chunks and tags them with page and content hashes.
+    Used by incremental uploads: chunks never cross a page boundary, so an
+    edit on one page only changes the chunks of that page. Short pages give
+    smaller chunks than chunk_text does on the whole document.
+    """
+    chunks = []
+    for page_text in pages:
+        page_hash = hash_text(page_text)
+        for i in range(0, len(page_text), chunk_size):
+            chunk = page_text[i:i + chunk_size].strip()
+            if chunk:
+                chunks.append({
+                    "content": chunk,
+                    "page_hash": page_hash,
+                    "chunk_hash": hash_text(chunk),
+                })
+    
+    logger.info(f"Created {len(chunks)} chunks from {len(pages)} pages")
+    return chunks
@@ -1,8 +1,11 @@
 import os
+import json
 from typing import List
 from supabase import create_client, Client
 from openai import OpenAI
 from dotenv import load_dotenv
+from services.cache import shared_cache
+from services.warmup import search_warm_session
 import logging
 
 load_dotenv()
@@ -18,6 +21,39 @@ supabase: Client = create_client(supabase_url, supabase_key)
 
 openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY", ""))
 
+# Max inputs per embeddings request, rows per insert and ids per delete filter
+EMBEDDING_BATCH_SIZE = 512
+INSERT_BATCH_SIZE = 500
+DELETE_BATCH_SIZE = 200
+
+def delete_documents(ids: List[int]):
+    """
+    Deletes document rows by id in batches.
+    """
+    for start in range(0, len(ids), DELETE_BATCH_SIZE):
+        supabase.table("documents").delete().in_("id", ids[start:start + DELETE_BATCH_SIZE]).execute()
+
+def parse_embedding(embedding) -> List[float]:
+    # pgvector columns come back from PostgREST as a "[0.1,0.2,...]" string
+    if isinstance(embedding, str):
+        return json.loads(embedding)
+    return embedding
+
+def insert_documents(rows: List[dict], batch_size: int = INSERT_BATCH_SIZE):
+    """
+    Inserts prepared document rows (content, metadata, embedding, session_id)
+    into Supabase in batches.
+    Returns the inserted rows.
+    """
+    logger.info(f"Inserting {len(rows)} documents into Supabase")
+    inserted = []
+    for start in range(0, len(rows), batch_size):
+        # Assuming 'documents' table exists with vector column
+        response = supabase.table("documents").insert(rows[start:start + batch_size]).execute()
+        inserted.extend(response.data or [])
+    logger.info(f"Successfully inserted {len(rows)} documents")
+    return inserted
+
 def get_embedding(text: str) -> List[float]:
     """
     Generates embedding for a given text using OpenAI.
@@ -34,6 +70,39 @@ def get_embedding(text: str) -> List[float]:
         logger.error(f"Error generating embedding: {str(e)}", exc_info=True)
         raise
 
+def get_query_embedding(query: str) -> List[float]:
+    """
+    Embeds a search query, sharing the result across workers through the host
+    cache. Document chunks go through get_embeddings and are never cached:
+    their vectors already live in Supabase and would only evict queries.
+    """
+    cache_key = shared_cache.make_key("text-embedding-3-small", query)
+    cached = shared_cache.get("embedding", cache_key)
+    if cached is not None:
+        return cached
+    embedding = get_embedding(query)
+    shared_cache.set("embedding", cache_key, embedding)
+    return embedding
+
+def get_embeddings(texts: List[str]) -> List[List[float]]:
+    """
+    Generates embeddings for several texts, batching OpenAI requests.
+    """
+    embeddings = []
+    try:
+        logger.info(f"Generating embeddings for {len(texts)} texts")
+        for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+            response = openai_client.embeddings.create(
+                input=texts[start:start + EMBEDDING_BATCH_SIZE],
+                model="text-embedding-3-small"
+            )
+            embeddings.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        logger.info("Embeddings generated successfully")
+        return embeddings
+    except Exception as e:
+        logger.error(f"Error generating embeddings: {str(e)}", exc_info=True)
+        raise
+
 async def store_embeddings(file_name: str, chunks: List[str], session_id: int = None):
     """
     Stores text chunks and their embeddings in Supabase.
@@ -45,17 +114,18 @@ async def store_embeddings(file_name: str, chunks: List[str], session_id: int =
             logger.warning("No chunks to store - empty chunks list")
             return None
         
-        data = []
+        kept = []
         for idx, chunk in enumerate(chunks):
-            logger.info(f"Processing chunk {idx+1}/{len(chunks)} - length: {len(chunk)}")
-            
             if not chunk.strip():
                 logger.warning(f"Skipping empty chunk {idx+1}")
                 continue
-            
-            embedding = get_embedding(chunk)
+            kept.append(idx)
+        
+        embeddings = get_embeddings([chunks[idx] for idx in kept])
+        data = []
+        for idx, embedding in zip(kept, embeddings):
             doc_data = {
-                "content": chunk,
+                "content": chunks[idx],
                 "metadata": {"file_name": file_name},
                 "embedding": embedding
             }
@@ -67,34 +137,181 @@ async def store_embeddings(file_name: str, chunks: List[str], session_id: int =
             logger.error("No valid data to insert - all chunks were empty")
             return None
         
-        logger.info(f"Inserting {len(data)} documents into Supabase")
-        # Assuming 'documents' table exists with vector column
-        response = supabase.table("documents").insert(data).execute()
-        logger.info(f"Successfully inserted {len(data)} documents")
-        return response
+        return insert_documents(data)
     except Exception as e:
         logger.error(f"Error storing embeddings: {str(e)}", exc_info=True)
         raise
 
+def _file_rows_query(file_name: str, session_id: int = None):
+    query = supabase.table("documents").select("id, metadata").eq("metadata->>file_name", file_name)
+    if session_id is not None:
+        return query.eq("session_id", session_id)
+    return query.is_("session_id", "null")
+
+def fetch_file_rows(file_name: str, session_id: int = None, page_size: int = 1000):
+    """
+    Returns the id and metadata of every stored chunk of a file, paging past
+    the PostgREST row limit.
+    """
+    rows = []
+    start = 0
+    while True:
+        response = _file_rows_query(file_name, session_id).order("id").range(start, start + page_size - 1).execute()
+        batch = response.data or []
+        rows.extend(batch)
+        if len(batch) < page_size:
+            return rows
+        start += page_size
+
+def _chunk_metadata(file_name: str, chunk: dict) -> dict:
+    # No absolute page number: it would have to be rewritten on every reused
+    # row whenever a page is inserted or removed before it
+    return {
+        "file_name": file_name,
+        "page_hash": chunk["page_hash"],
+        "chunk_hash": chunk["chunk_hash"],
+    }
+
+async def sync_embeddings(file_name: str, chunks: List[dict], session_id: int = None):
+    """
+    Incrementally re-ingests a revised file.
+    Each stored row remembers the hash of the page it was embedded from, so a
+    page whose hash matches keeps its rows wherever it now sits in the file.
+    Chunks of changed pages are matched by content hash, so only new or
+    changed chunks are embedded (in one batch), and rows that no longer exist
+    in the file are deleted. Reused rows are never rewritten.
+    Returns the number of reused, added and removed chunks.
+    """
+    try:
+        logger.info(f"Syncing {len(chunks)} chunks for file: {file_name}, session_id: {session_id}")
+        
+        stored = fetch_file_rows(file_name, session_id)
+        # Rows uploaded without hashes can never be matched and end up stale
+        existing = [row for row in stored if (row.get("metadata") or {}).get("chunk_hash")]
+        
+        # Stored rows, per source page hash and per chunk hash
+        by_page = {}
+        by_chunk = {}
+        for row in existing:
+            metadata = row["metadata"]
+            by_page.setdefault(metadata.get("page_hash"), {}).setdefault(metadata["chunk_hash"], []).append(row)
+            by_chunk.setdefault(metadata["chunk_hash"], []).append(row)
+        
+        new_pages = {}
+        for chunk in chunks:
+            new_pages.setdefault(chunk["page_hash"], []).append(chunk)
+        
+        claimed = set()
+        
+        def claim(candidates):
+            for row in candidates:
+                if row["id"] not in claimed:
+                    claimed.add(row["id"])
+                    return row
+            return None
+        
+        changed_chunks = []
+        reused = 0
+        for page_hash, page_chunks in new_pages.items():
+            stored_page = by_page.get(page_hash, {})
+            # Unchanged page: every chunk is already stored under this page hash
+            needed = {}
+            for chunk in page_chunks:
+                needed[chunk["chunk_hash"]] = needed.get(chunk["chunk_hash"], 0) + 1
+            available = all(
+                sum(row["id"] not in claimed for row in stored_page.get(chunk_hash, [])) >= count
+                for chunk_hash, count in needed.items()
+            )
+            if available:
+                for chunk in page_chunks:
+                    claim(stored_page[chunk["chunk_hash"]])
+                reused += len(page_chunks)
+            else:
+                changed_chunks.extend(page_chunks)
+        
+        # Chunks on changed pages may still exist elsewhere in the stored file
+        new_chunks = []
+        for chunk in changed_chunks:
+            if claim(by_chunk.get(chunk["chunk_hash"], [])) is not None:
+                reused += 1
+            else:
+                new_chunks.append(chunk)
+        
+        stale_ids = [row["id"] for row in stored if row["id"] not in claimed]
+        logger.info(f"Reusing {reused} chunks, embedding {len(new_chunks)}, removing {len(stale_ids)}")
+        
+        if new_chunks:
+            embeddings = get_embeddings([chunk["content"] for chunk in new_chunks])
+            data = []
+            for chunk, embedding in zip(new_chunks, embeddings):
+                doc_data = {
+                    "content": chunk["content"],
+                    "metadata": _chunk_metadata(file_name, chunk),
+                    "embedding": embedding
+                }
+                if session_id is not None:
+                    doc_data["session_id"] = session_id
+                data.append(doc_data)
+            insert_documents(data)
+        
+        # Delete after inserting so a failed insert never loses the old version
+        delete_documents(stale_ids)
+        
+        return {"reused": reused, "added": len(new_chunks), "removed": len(stale_ids)}
+    except Exception as e:
+        logger.error(f"Error syncing embeddings: {str(e)}", exc_info=True)
+        raise
+
+def retrieval_cache_key(query: str, match_threshold: float, match_count: int) -> str:
+    """
+    Key of a session-scoped retrieval result in the shared cache.
+    """
+    return shared_cache.make_key(query, match_threshold, match_count)
+
+def match_documents(query_embedding: List[float], match_threshold: float, match_count: int, session_id: int = None) -> List[dict]:
+    """
+    Runs the 'match_documents' Postgres function in Supabase.
+    """
+    params = {
+        "query_embedding": query_embedding,
+        "match_threshold": match_threshold,
+        "match_count": match_count,
+        "filter_session_id": session_id
+    }
+    response = supabase.rpc("match_documents", params).execute()
+    return response.data
+
 async def query_documents(query: str, match_threshold: float = 0.3, match_count: int = 5, session_id: int = None):
     """
     Searches for relevant documents using vector similarity.
     Required: A Postgres function 'match_documents' in Supabase.
+    Session-scoped results are cached until the session is invalidated.
     """
     try:
         logger.info(f"Querying documents: query='{query[:50]}...', session_id={session_id}")
-        embedding = get_embedding(query)
+        if session_id is not None:
+            cache_key = retrieval_cache_key(query, match_threshold, match_count)
+            version = shared_cache.session_version(session_id)
+            cached = shared_cache.get("retrieval", cache_key, session_id=session_id)
+            if cached is not None:
+                logger.info(f"Using {len(cached)} cached matching documents")
+                return cached
+        embedding = get_query_embedding(query)
+        
+        # Sessions preloaded by the warm-up hook are searched in memory
+        if session_id is not None:
+            warm_docs = search_warm_session(session_id, embedding, match_threshold, match_count)
+            if warm_docs is not None:
+                logger.info(f"Found {len(warm_docs)} matching documents in warm session")
+                shared_cache.set("retrieval", cache_key, warm_docs, session_id=session_id, version=version)
+                return warm_docs
         
         # RPC call to Supabase function
-        params = {
-            "query_embedding": embedding,
-            "match_threshold": match_threshold,
-            "match_count": match_count,
-            "filter_session_id": session_id
-        }
-        response = supabase.rpc("match_documents", params).execute()
-        logger.info(f"Found {len(response.data) if response.data else 0} matching documents")
-        return response.data
+        docs = match_documents(embedding, match_threshold, match_count, session_id)
+        logger.info(f"Found {len(docs) if docs else 0} matching documents")
+        if session_id is not None and docs is not None:
+            shared_cache.set("retrieval", cache_key, docs, session_id=session_id, version=version)
+        return docs
     except Exception as e:
         logger.error(f"Error querying documents: {str(e)}", exc_info=True)
         raise
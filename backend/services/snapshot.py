@@ -0,0 +1,224 @@
+from typing import Iterator, List, Optional
+import io
+import json
+import logging
+import struct
+import tempfile
+import zipfile
+
+import numpy as np
+
+from services.rag import supabase, insert_documents, delete_documents, parse_embedding
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Snapshot layout:
+#   MAGIC
+#   frame*   where frame = <u64 little-endian length><.npz bytes>
+# The first frame holds the JSON header, the last one a trailer with the total
+# row count, and every frame in between one batch of rows as contiguous arrays
+# (float32 embeddings, utf-8 text + int64 offsets).
+MAGIC = b"SBSNAP1\n"
+FRAME_LENGTH = struct.Struct("<Q")
+SNAPSHOT_VERSION = 2
+# Export frames hold 1000 rows (~7 MB); anything far larger is corrupt
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+# Imports are spooled to disk past this size while they are validated
+SPOOL_MEMORY_BYTES = 16 * 1024 * 1024
+
+def _pack_strings(values: List[str]):
+    """
+    Packs strings into one utf-8 byte array plus an offsets array.
+    """
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(value) for value in encoded])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+def _unpack_strings(data: np.ndarray, offsets: np.ndarray) -> List[str]:
+    raw = data.tobytes()
+    return [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+def _frame(arrays: dict) -> bytes:
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    payload = buffer.getvalue()
+    return FRAME_LENGTH.pack(len(payload)) + payload
+
+def _encode_batch(rows: List[dict]) -> bytes:
+    content, content_offsets = _pack_strings([row["content"] for row in rows])
+    metadata, metadata_offsets = _pack_strings([json.dumps(row.get("metadata") or {}) for row in rows])
+    embeddings = np.asarray([parse_embedding(row["embedding"]) for row in rows], dtype=np.float32)
+    return _frame({
+        "embeddings": embeddings,
+        "content": content,
+        "content_offsets": content_offsets,
+        "metadata": metadata,
+        "metadata_offsets": metadata_offsets,
+    })
+
+def _decode_batch(arrays, session_id: Optional[int]) -> List[dict]:
+    contents = _unpack_strings(arrays["content"], arrays["content_offsets"])
+    metadatas = _unpack_strings(arrays["metadata"], arrays["metadata_offsets"])
+    embeddings = arrays["embeddings"]
+    if not (len(contents) == len(metadatas) == len(embeddings)):
+        raise ValueError("Snapshot batch arrays have mismatched lengths")
+    rows = []
+    for idx, content in enumerate(contents):
+        row = {
+            "content": content,
+            "metadata": json.loads(metadatas[idx]),
+            "embedding": embeddings[idx].tolist(),
+        }
+        if session_id is not None:
+            row["session_id"] = session_id
+        rows.append(row)
+    return rows
+
+def _load_frame(payload: bytes, decode):
+    """
+    Parses one frame payload with `decode`, turning any corruption into a
+    ValueError so the endpoint answers 400.
+    """
+    try:
+        with np.load(io.BytesIO(payload), allow_pickle=False) as arrays:
+            return decode(arrays)
+    except (zipfile.BadZipFile, KeyError, ValueError, IndexError, EOFError, OSError) as e:
+        raise ValueError(f"Corrupt session snapshot: {e}") from e
+
+def _decode_header(arrays) -> dict:
+    header = json.loads(arrays["header"].tobytes().decode("utf-8"))
+    if not isinstance(header, dict):
+        raise ValueError("Snapshot header is not an object")
+    if header.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version: {header.get('version')}")
+    if not isinstance(header.get("session"), dict):
+        raise ValueError("Snapshot header has no session")
+    return header
+
+def _decode_frame(arrays, session_id: Optional[int]):
+    """
+    Decodes a frame after the header: the trailer's row count as an int, or
+    a batch of rows as a list.
+    """
+    if "trailer" in arrays:
+        return int(arrays["trailer"][0])
+    return _decode_batch(arrays, session_id)
+
+def _iter_frames(buffer: bytearray):
+    """
+    Pops every complete frame payload off the front of the buffer.
+    """
+    while len(buffer) >= FRAME_LENGTH.size:
+        (length,) = FRAME_LENGTH.unpack_from(buffer)
+        if length > MAX_FRAME_BYTES:
+            raise ValueError(f"Snapshot frame of {length} bytes exceeds the {MAX_FRAME_BYTES} byte limit")
+        end = FRAME_LENGTH.size + length
+        if len(buffer) < end:
+            return
+        payload = bytes(buffer[FRAME_LENGTH.size:end])
+        del buffer[:end]
+        yield payload
+
+def iter_session_snapshot(session: dict, batch_size: int = 1000) -> Iterator[bytes]:
+    """
+    Streams a session's documents as a binary snapshot, one page of rows at a
+    time, so the whole session is never held in memory.
+    """
+    session_id = session["id"]
+    logger.info(f"Exporting snapshot for session_id: {session_id}")
+    yield MAGIC
+    header = {
+        "version": SNAPSHOT_VERSION,
+        "session": {"name": session.get("name"), "description": session.get("description")},
+    }
+    yield _frame({"header": np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8)})
+
+    exported = 0
+    start = 0
+    while True:
+        response = (
+            supabase.table("documents")
+            .select("content, metadata, embedding")
+            .eq("session_id", session_id)
+            .order("id")
+            .range(start, start + batch_size - 1)
+            .execute()
+        )
+        rows = response.data or []
+        if rows:
+            yield _encode_batch(rows)
+            exported += len(rows)
+        if len(rows) < batch_size:
+            break
+        start += batch_size
+    # Lets the import tell a complete snapshot from one cut on a frame boundary
+    yield _frame({"trailer": np.array([exported], dtype=np.int64)})
+    logger.info(f"Exported {exported} documents for session_id: {session_id}")
+
+async def import_session_snapshot(stream, session_id: int) -> dict:
+    """
+    Restores a snapshot from an async byte stream into the given session
+    without computing embeddings.
+    The whole stream is validated first (frames are spooled to a temporary
+    file), so a truncated or corrupt snapshot inserts nothing. If an insert
+    fails midway, the rows inserted so far are deleted again. A snapshot
+    whose trailer is missing or does not match the rows read is rejected.
+    """
+    logger.info(f"Importing snapshot into session_id: {session_id}")
+    buffer = bytearray()
+    header = None
+    trailer = None
+    rows_read = 0
+    magic_checked = False
+
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES) as spool:
+        async for chunk in stream:
+            buffer.extend(chunk)
+            if not magic_checked:
+                if len(buffer) < len(MAGIC):
+                    continue
+                if bytes(buffer[:len(MAGIC)]) != MAGIC:
+                    raise ValueError("Not a session snapshot")
+                del buffer[:len(MAGIC)]
+                magic_checked = True
+
+            for payload in _iter_frames(buffer):
+                if header is None:
+                    header = _load_frame(payload, _decode_header)
+                    continue
+                if trailer is not None:
+                    raise ValueError("Corrupt session snapshot: data after the trailer")
+                decoded = _load_frame(payload, lambda arrays: _decode_frame(arrays, session_id))
+                if isinstance(decoded, int):
+                    trailer = decoded
+                    continue
+                rows_read += len(decoded)
+                spool.write(FRAME_LENGTH.pack(len(payload)))
+                spool.write(payload)
+
+        if not magic_checked or header is None or trailer is None or buffer:
+            raise ValueError("Truncated session snapshot")
+        if trailer != rows_read:
+            raise ValueError(f"Truncated session snapshot: expected {trailer} documents, found {rows_read}")
+
+        # Second pass: every frame is known to be valid, insert them
+        spool.seek(0)
+        inserted_ids = []
+        try:
+            while True:
+                prefix = spool.read(FRAME_LENGTH.size)
+                if not prefix:
+                    break
+                (length,) = FRAME_LENGTH.unpack(prefix)
+                rows = _load_frame(spool.read(length), lambda arrays: _decode_batch(arrays, session_id))
+                inserted_ids.extend(row["id"] for row in insert_documents(rows))
+        except Exception:
+            logger.error(f"Snapshot import failed, removing {len(inserted_ids)} inserted documents")
+            delete_documents(inserted_ids)
+            raise
+
+    logger.info(f"Imported {len(inserted_ids)} documents into session_id: {session_id}")
+    return {"documents_imported": len(inserted_ids), "source_session": header["session"]}
@@ -0,0 +1,290 @@
+import os
+import time
+import base64
+import threading
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from services.cache import shared_cache
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# A session whose embeddings exceed this is not preloaded (catalog only).
+# Preloads are stored in the shared cache, so keep this well below CACHE_MAX_BYTES.
+WARMUP_SESSION_MAX_BYTES = int(os.environ.get("WARMUP_SESSION_MAX_BYTES", str(32 * 1024 * 1024)))
+# Upper bound for all preloaded sessions decoded in this worker
+WARMUP_TOTAL_MAX_BYTES = int(os.environ.get("WARMUP_TOTAL_MAX_BYTES", str(256 * 1024 * 1024)))
+# Preloaded sessions not queried for this long are dropped
+WARMUP_IDLE_SECONDS = float(os.environ.get("WARMUP_IDLE_SECONDS", "900"))
+
+# (query, match_threshold, match_count) the app is likely to send first: the
+# summary and flashcard retrievals (routers/study.py) and the suggested
+# questions shown in StudySession.tsx at the /chat defaults. Keep in sync.
+STARTER_QUERIES = [
+    ("summarize all content", 0.2, 10),
+    ("generate flashcards from all content", 0.2, 10),
+    ("Summarize the key points", 0.3, 5),
+    ("Explain this concept in simple terms", 0.3, 5),
+    ("Create practice questions for me", 0.3, 5),
+    ("What are the main takeaways?", 0.3, 5),
+]
+
+class WarmSession:
+    """
+    A session's chunks preloaded for retrieval, with unit-normalised
+    embeddings so similarity is a single matrix-vector product.
+
+    Preloads live in two tiers: the shared cache (namespace "warm", scoped to
+    the session version) so every worker on the host can use them, and a
+    decoded copy in each worker that has touched the session since.
+    """
+
+    def __init__(self, version: int, rows: List[dict], embeddings: Optional[np.ndarray], catalog: Dict[str, int]):
+        self.version = version
+        self.rows = rows
+        self.embeddings = embeddings
+        self.catalog = catalog
+        self.nbytes = (embeddings.nbytes if embeddings is not None else 0) + sum(len(row["content"]) for row in rows)
+        self.last_used = time.monotonic()
+
+    def to_shared(self) -> dict:
+        embeddings = None
+        if self.embeddings is not None:
+            embeddings = {
+                "shape": list(self.embeddings.shape),
+                "data": base64.b64encode(self.embeddings.tobytes()).decode("ascii"),
+            }
+        return {"rows": self.rows, "catalog": self.catalog, "embeddings": embeddings}
+
+    @classmethod
+    def from_shared(cls, version: int, value: dict) -> "WarmSession":
+        embeddings = None
+        if value["embeddings"] is not None:
+            data = base64.b64decode(value["embeddings"]["data"])
+            embeddings = np.frombuffer(data, dtype=np.float32).reshape(value["embeddings"]["shape"])
+        return cls(version, value["rows"], embeddings, value["catalog"])
+
+_warm_sessions: Dict[int, WarmSession] = {}
+_warming = set()
+_lock = threading.Lock()
+_sweep_timer: Optional[threading.Timer] = None
+
+def _evict_idle() -> None:
+    now = time.monotonic()
+    with _lock:
+        for session_id in [sid for sid, warm in _warm_sessions.items() if now - warm.last_used > WARMUP_IDLE_SECONDS]:
+            del _warm_sessions[session_id]
+            logger.info(f"Evicted idle warm session_id: {session_id}")
+
+def _sweep() -> None:
+    global _sweep_timer
+    _evict_idle()
+    with _lock:
+        _sweep_timer = None
+        if _warm_sessions:
+            _schedule_sweep_locked()
+
+def _schedule_sweep_locked() -> None:
+    global _sweep_timer
+    if _sweep_timer is None:
+        _sweep_timer = threading.Timer(WARMUP_IDLE_SECONDS / 2, _sweep)
+        _sweep_timer.daemon = True
+        _sweep_timer.start()
+
+def _store(session_id: int, warm: WarmSession) -> None:
+    with _lock:
+        _warm_sessions[session_id] = warm
+        # Keep the worker under its total budget, dropping least recently used sessions first
+        total = sum(entry.nbytes for entry in _warm_sessions.values())
+        for sid, entry in sorted(_warm_sessions.items(), key=lambda item: item[1].last_used):
+            if total <= WARMUP_TOTAL_MAX_BYTES or sid == session_id:
+                continue
+            del _warm_sessions[sid]
+            total -= entry.nbytes
+            logger.info(f"Evicted warm session_id: {sid} to stay under budget")
+        _schedule_sweep_locked()
+
+def _load_shared(session_id: int, version: int) -> Optional[WarmSession]:
+    """
+    Decodes a preload another worker (or this one) stored in the shared cache.
+    """
+    value = shared_cache.get("warm", "session", session_id=session_id)
+    if value is None:
+        return None
+    warm = WarmSession.from_shared(version, value)
+    _store(session_id, warm)
+    return warm
+
+def _get(session_id: int) -> Optional[WarmSession]:
+    version = shared_cache.session_version(session_id)
+    with _lock:
+        warm = _warm_sessions.get(session_id)
+    if warm is not None and warm.version != version:
+        # Documents changed since the preload (possibly in another worker)
+        with _lock:
+            _warm_sessions.pop(session_id, None)
+        warm = None
+    if warm is None:
+        warm = _load_shared(session_id, version)
+        if warm is None:
+            return None
+    warm.last_used = time.monotonic()
+    return warm
+
+def drop_session(session_id: int) -> None:
+    """
+    Makes a session cold in every worker by invalidating its shared cache
+    entries (preload, retrievals and summary).
+    """
+    with _lock:
+        _warm_sessions.pop(session_id, None)
+    shared_cache.invalidate_session(session_id)
+
+def warmup_status(session_id: int) -> dict:
+    warm = _get(session_id)
+    with _lock:
+        warming = session_id in _warming
+    if warm is None:
+        return {"session_id": session_id, "warm": False, "warming": warming}
+    return {
+        "session_id": session_id,
+        "warm": True,
+        "warming": warming,
+        "chunks": len(warm.rows),
+        "embeddings_loaded": warm.embeddings is not None,
+        "bytes": warm.nbytes,
+        "catalog": warm.catalog,
+    }
+
+def _prefetch_starters(session_id: int, version: int, warm: WarmSession) -> None:
+    """
+    Embeds the starter queries and stores their retrieval results in the
+    shared cache, so the first summary, flashcards or suggested question
+    skips retrieval entirely. Sessions preloaded without embeddings fall
+    back to match_documents.
+    """
+    from services.rag import get_query_embedding, match_documents, retrieval_cache_key
+
+    for query, match_threshold, match_count in STARTER_QUERIES:
+        cache_key = retrieval_cache_key(query, match_threshold, match_count)
+        if shared_cache.get("retrieval", cache_key, session_id=session_id) is not None:
+            continue
+        embedding = get_query_embedding(query)
+        if warm.embeddings is not None:
+            docs = _search(warm, embedding, match_threshold, match_count)
+        else:
+            docs = match_documents(embedding, match_threshold, match_count, session_id)
+        if docs is not None:
+            shared_cache.set("retrieval", cache_key, docs, session_id=session_id, version=version)
+
+def warm_session(session_id: int, page_size: int = 1000) -> None:
+    """
+    Preloads a session so its first query does not pay for a cold
+    match_documents scan: loads its chunks and embeddings into the shared
+    cache (unless another worker already did) and into this worker, and
+    prefetches the starter queries' retrievals. The Supabase and
+    OpenAI calls also open this worker's pooled connections; other workers
+    still open theirs on their first request.
+    Meant to run as a background task.
+    """
+    # Imported here because rag consults this module on every query
+    from services.rag import supabase, parse_embedding
+
+    _evict_idle()
+    version = shared_cache.session_version(session_id)
+    with _lock:
+        current = _warm_sessions.get(session_id)
+        if current is not None and current.version == version:
+            current.last_used = time.monotonic()
+            return
+        if session_id in _warming:
+            return
+        _warming.add(session_id)
+
+    try:
+        started = time.perf_counter()
+        warm = _load_shared(session_id, version)
+        if warm is not None:
+            _prefetch_starters(session_id, version, warm)
+            logger.info(f"Loaded warm session_id: {session_id} from the shared cache")
+            return
+
+        rows = []
+        vectors = []
+        catalog: Dict[str, int] = {}
+        nbytes = 0
+        over_budget = False
+        start = 0
+        while True:
+            columns = "id, content, metadata" if over_budget else "id, content, metadata, embedding"
+            response = (
+                supabase.table("documents")
+                .select(columns)
+                .eq("session_id", session_id)
+                .order("id")
+                .range(start, start + page_size - 1)
+                .execute()
+            )
+            batch = response.data or []
+            for row in batch:
+                metadata = row.get("metadata") or {}
+                file_name = metadata.get("file_name", "Unknown")
+                catalog[file_name] = catalog.get(file_name, 0) + 1
+                if over_budget:
+                    continue
+                embedding = parse_embedding(row["embedding"])
+                nbytes += len(embedding) * 4 + len(row["content"])
+                if nbytes > WARMUP_SESSION_MAX_BYTES:
+                    logger.warning(f"Session {session_id} exceeds warm-up budget, loading catalog only")
+                    over_budget = True
+                    rows, vectors = [], []
+                    continue
+                rows.append({"id": row["id"], "content": row["content"], "metadata": metadata})
+                vectors.append(embedding)
+            if len(batch) < page_size:
+                break
+            start += page_size
+
+        embeddings = None
+        if vectors:
+            embeddings = np.asarray(vectors, dtype=np.float32)
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.where(norms == 0, 1, norms)
+
+        warm = WarmSession(version, rows, embeddings, catalog)
+        # The version guard skips storing if the session was invalidated while loading
+        shared_cache.set("warm", "session", warm.to_shared(), session_id=session_id, version=version)
+        if shared_cache.session_version(session_id) == version:
+            _store(session_id, warm)
+        _prefetch_starters(session_id, version, warm)
+        logger.info(f"Warmed session_id: {session_id} ({len(rows)} chunks) in {time.perf_counter() - started:.2f}s")
+    except Exception as e:
+        logger.error(f"Error warming session {session_id}: {str(e)}", exc_info=True)
+    finally:
+        with _lock:
+            _warming.discard(session_id)
+
+def search_warm_session(session_id: int, query_embedding: List[float], match_threshold: float, match_count: int) -> Optional[List[dict]]:
+    """
+    Answers a similarity query from the preloaded session, mirroring
+    match_documents (cosine similarity above the threshold, best first).
+    Returns None when the session is not warm.
+    """
+    warm = _get(session_id)
+    if warm is None or warm.embeddings is None:
+        return None
+    return _search(warm, query_embedding, match_threshold, match_count)
+
+def _search(warm: WarmSession, query_embedding: List[float], match_threshold: float, match_count: int) -> List[dict]:
+    query = np.asarray(query_embedding, dtype=np.float32)
+    norm = np.linalg.norm(query)
+    if norm == 0:
+        return []
+    similarities = warm.embeddings @ (query / norm)
+    candidates = np.nonzero(similarities > match_threshold)[0]
+    best = candidates[np.argsort(-similarities[candidates], kind="stable")][:match_count]
+    return [{**warm.rows[idx], "similarity": float(similarities[idx])} for idx in best]
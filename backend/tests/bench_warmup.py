@@ -0,0 +1,91 @@
+import requests
+import statistics
+import sys
+import time
+
+BASE_URL = "http://localhost:8000"
+# A free-form question (answered from the preloaded embeddings once warm) and a
+# suggested question from StudySession.tsx (its retrieval is prefetched)
+QUESTIONS = {
+    "free-form": "What are the main topics covered in these notes?",
+    "suggested": "Summarize the key points",
+}
+DEFAULT_ROUNDS = 20
+
+def retrieval_ms(session_id, question):
+    """Retrieval time of one /chat request, read from its Server-Timing header (excludes the completion)"""
+    response = requests.post(f"{BASE_URL}/api/study/chat", json={"message": question, "session_id": session_id})
+    response.raise_for_status()
+    for metric in response.headers.get("Server-Timing", "").split(","):
+        name, _, duration = metric.strip().partition(";dur=")
+        if name == "retrieval":
+            return float(duration)
+    raise RuntimeError("Server did not report retrieval timing; is it running this version?")
+
+def wait_until_warm(session_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = requests.get(f"{BASE_URL}/api/sessions/{session_id}/warmup").json()
+        if status.get("warm") and not status.get("warming"):
+            return status
+        time.sleep(0.2)
+    return None
+
+def bench(session_id, rounds):
+    # Query embeddings are cached host-wide and never invalidated; embed both
+    # questions once so every round compares only the search itself
+    for question in QUESTIONS.values():
+        retrieval_ms(session_id, question)
+
+    results = {label: {"cold": [], "warm": []} for label in QUESTIONS}
+    for round_number in range(1, rounds + 1):
+        for label, question in QUESTIONS.items():
+            # Cache-cold: drop the session's preload and cached retrievals in every worker
+            requests.delete(f"{BASE_URL}/api/sessions/{session_id}/warmup")
+            results[label]["cold"].append(retrieval_ms(session_id, question))
+
+            # Warm: open the session (StudySession fetches it on mount), wait for the warm-up, then query
+            requests.delete(f"{BASE_URL}/api/sessions/{session_id}/warmup")
+            requests.get(f"{BASE_URL}/api/sessions/{session_id}")
+            if wait_until_warm(session_id) is None:
+                print("❌ Session did not warm up in time")
+                return
+            results[label]["warm"].append(retrieval_ms(session_id, question))
+        print(f"   Round {round_number}: " + ", ".join(
+            f"{label} cold {times['cold'][-1]:.1f} ms / warm {times['warm'][-1]:.1f} ms"
+            for label, times in results.items()
+        ))
+
+    print(f"\n📊 Server-side retrieval time over {rounds} rounds (median, p90)")
+    for label, times in results.items():
+        for state in ("cold", "warm"):
+            samples = sorted(times[state])
+            p90 = samples[min(len(samples) - 1, int(len(samples) * 0.9))]
+            print(f"   {label:<9} {state}: {statistics.median(samples):.1f} ms, p90 {p90:.1f} ms")
+
+def main():
+    print("=" * 60)
+    print("⏱️  AI Study Buddy - Session Warm-up Benchmark")
+    print("=" * 60)
+
+    if len(sys.argv) < 2:
+        print("Usage: python bench_warmup.py <session_id> [rounds]")
+        return
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_ROUNDS
+
+    # Check if server is running
+    try:
+        requests.get(BASE_URL, timeout=2)
+    except:
+        print("\n❌ Server is not running!")
+        print("   Start it with: python -m uvicorn main:app")
+        return
+
+    print("   Cold means cache-cold: the preload and cached retrievals are dropped,")
+    print("   but workers keep their open Supabase/OpenAI connections, so connection")
+    print("   setup on a freshly started worker is not included.")
+    print("   Each /chat still runs a completion; only retrieval time is reported.")
+    bench(int(sys.argv[1]), rounds)
+
+if __name__ == "__main__":
+    main()
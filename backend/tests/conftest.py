@@ -0,0 +1,37 @@
+"""
+Fixtures for the offline service tests. Every test gets fresh fakes and a
+fresh shared cache; monkeypatch puts the real module globals back afterwards.
+"""
+import os
+
+import pytest
+
+from fakes import FakeSupabase, FakeOpenAI
+
+from services import rag, snapshot, warmup
+from services.cache import SharedCache
+from routers import sessions, study
+
+# Scripts that need a running server or a real Supabase project
+collect_ignore = ["test_routes.py", "test_upload.py", "test_db_connection.py", "debug_db.py"]
+
+@pytest.fixture(autouse=True)
+def fake_db(monkeypatch):
+    db = FakeSupabase()
+    monkeypatch.setattr(rag, "supabase", db)
+    monkeypatch.setattr(snapshot, "supabase", db)
+    return db
+
+@pytest.fixture(autouse=True)
+def fake_ai(monkeypatch):
+    ai = FakeOpenAI()
+    monkeypatch.setattr(rag, "openai_client", ai)
+    return ai
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch, tmp_path):
+    shared = SharedCache(os.path.join(tmp_path, "cache.sqlite3"))
+    for module in (rag, warmup, study, sessions):
+        monkeypatch.setattr(module, "shared_cache", shared)
+    monkeypatch.setattr(warmup, "_warm_sessions", {})
+    return shared
@@ -0,0 +1,127 @@
+"""
+In-memory stand-ins for Supabase and OpenAI so service logic can be checked
+offline. Import this module before any `services.*` module.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Dummy credentials so the module-level clients can be constructed
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ["CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "cache.sqlite3")
+
+def _lookup(row, column):
+    if "->>" in column:
+        field, key = column.split("->>")
+        return (row.get(field) or {}).get(key)
+    return row.get(column)
+
+class FakeQuery:
+    def __init__(self, table, action, payload=None):
+        self.table = table
+        self.action = action
+        self.payload = payload
+        self.filters = []
+        self.bounds = None
+
+    def select(self, columns):
+        self.columns = [column.strip() for column in columns.split(",")]
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: _lookup(row, column) == value)
+        return self
+
+    def is_(self, column, value):
+        self.filters.append(lambda row: _lookup(row, column) is None)
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(lambda row: _lookup(row, column) in values)
+        return self
+
+    def order(self, column):
+        return self
+
+    def range(self, start, end):
+        self.bounds = (start, end)
+        return self
+
+    def _matching(self):
+        return [row for row in self.table.rows if all(check(row) for check in self.filters)]
+
+    def execute(self):
+        self.table.calls.append(self.action)
+        if self.action == "select":
+            rows = self._matching()
+            if self.bounds:
+                rows = rows[self.bounds[0]:self.bounds[1] + 1]
+            return SimpleNamespace(data=[{column: row.get(column) for column in self.columns} for row in rows])
+        if self.action == "insert":
+            inserted = []
+            for row in self.payload:
+                self.table.next_id += 1
+                inserted.append({"id": self.table.next_id, **row})
+            self.table.rows.extend(inserted)
+            return SimpleNamespace(data=inserted)
+        if self.action == "update":
+            rows = self._matching()
+            for row in rows:
+                row.update(self.payload)
+            return SimpleNamespace(data=rows)
+        if self.action == "delete":
+            rows = self._matching()
+            self.table.rows = [row for row in self.table.rows if row not in rows]
+            return SimpleNamespace(data=rows)
+        raise AssertionError(f"Unexpected action {self.action}")
+
+class FakeTable:
+    def __init__(self):
+        self.rows = []
+        self.next_id = 0
+        self.calls = []
+
+    def select(self, columns):
+        return FakeQuery(self, "select").select(columns)
+
+    def insert(self, rows):
+        return FakeQuery(self, "insert", rows)
+
+    def update(self, data):
+        return FakeQuery(self, "update", data)
+
+    def delete(self):
+        return FakeQuery(self, "delete")
+
+class FakeSupabase:
+    def __init__(self):
+        self.tables = {}
+        self.rpc_calls = []
+        self.rpc_results = {}
+
+    def table(self, name):
+        return self.tables.setdefault(name, FakeTable())
+
+    def rpc(self, name, params=None):
+        self.rpc_calls.append((name, params))
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=self.rpc_results.get(name, [])))
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.inputs = []
+
+    def create(self, input, model):
+        texts = [input] if isinstance(input, str) else list(input)
+        self.inputs.extend(texts)
+        data = [SimpleNamespace(index=idx, embedding=[float(len(text)), 1.0, 0.0]) for idx, text in enumerate(texts)]
+        return SimpleNamespace(data=data)
+
+class FakeOpenAI:
+    def __init__(self):
+        self.embeddings = FakeEmbeddings()
@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+import tempfile
+
+from services import rag
+from services.cache import SharedCache
+
+def make_cache(max_bytes=10_000, touch_seconds=30):
+    return SharedCache(os.path.join(tempfile.mkdtemp(), "cache.sqlite3"), max_bytes=max_bytes, touch_seconds=touch_seconds)
+
+def _read_in_child(path, queue):
+    cache = SharedCache(path)
+    queue.put((cache.get("embedding", "k"), cache.get("retrieval", "q", session_id=5)))
+
+def test_values_round_trip_and_scope():
+    cache = make_cache()
+    cache.set("embedding", "k", [0.5, 1.0])
+    cache.set("retrieval", "q", [{"id": 1}], session_id=5)
+    assert cache.get("embedding", "k") == [0.5, 1.0]
+    assert cache.get("retrieval", "q", session_id=5) == [{"id": 1}]
+    # Entries are only visible in the scope they were stored in
+    assert cache.get("retrieval", "q", session_id=6) is None
+    assert cache.get("retrieval", "q") is None
+
+def test_other_processes_see_entries():
+    cache = make_cache()
+    cache.set("embedding", "k", [0.5])
+    cache.set("retrieval", "q", {"x": 1}, session_id=5)
+    queue = multiprocessing.Queue()
+    child = multiprocessing.Process(target=_read_in_child, args=(cache.path, queue))
+    child.start()
+    child.join(timeout=30)
+    assert queue.get(timeout=5) == ([0.5], {"x": 1})
+
+def test_invalidation_hides_session_entries():
+    cache = make_cache()
+    cache.set("retrieval", "q", "old", session_id=5)
+    cache.set("retrieval", "q2", "other", session_id=6)
+    cache.set("embedding", "k", [1.0])
+    assert cache.session_version(5) == 0
+    cache.invalidate_session(5)
+    assert cache.session_version(5) == 1
+    assert cache.get("retrieval", "q", session_id=5) is None
+    assert cache.get("retrieval", "q2", session_id=6) == "other"
+    assert cache.get("embedding", "k") == [1.0]
+    cache.set("retrieval", "q", "new", session_id=5)
+    assert cache.get("retrieval", "q", session_id=5) == "new"
+
+def test_result_computed_across_invalidation_is_not_stored():
+    cache = make_cache()
+    version = cache.session_version(5)
+    cache.invalidate_session(5)
+    cache.set("retrieval", "q", "stale", session_id=5, version=version)
+    assert cache.get("retrieval", "q", session_id=5) is None
+
+def test_eviction_keeps_size_bounded_and_drops_least_recently_used():
+    cache = make_cache(max_bytes=2_000)
+    for idx in range(100):
+        cache.set("n", str(idx), "y" * 100)
+    conn = cache._connection()
+    (total,) = conn.execute("SELECT SUM(size) FROM entries").fetchone()
+    (tracked,) = conn.execute("SELECT total_bytes FROM stats").fetchone()
+    assert total == tracked <= 2_000
+    assert cache.get("n", "0") is None
+    assert cache.get("n", "99") == "y" * 100
+
+def test_recently_read_entries_survive_eviction():
+    cache = make_cache(max_bytes=2_000, touch_seconds=0)
+    cache.set("embedding", "hot", "x" * 100)
+    for idx in range(100):
+        cache.set("warm", str(idx), "y" * 100)
+        assert cache.get("embedding", "hot") == "x" * 100
+    assert cache.get("warm", "0") is None
+
+def test_reads_within_touch_interval_do_not_write():
+    cache = make_cache(touch_seconds=3600)
+    cache.set("n", "k", "v")
+    conn = cache._connection()
+    (stored_at,) = conn.execute("SELECT stored_at FROM entries").fetchone()
+    assert cache.get("n", "k") == "v"
+    assert conn.execute("SELECT stored_at FROM entries").fetchone()[0] == stored_at
+
+def test_oversized_values_are_skipped():
+    cache = make_cache(max_bytes=100)
+    cache.set("n", "big", "y" * 500)
+    assert cache.get("n", "big") is None
+
+def test_only_query_embeddings_are_cached(cache, fake_ai):
+    rag.get_query_embedding("what is a cell?")
+    rag.get_query_embedding("what is a cell?")
+    assert fake_ai.embeddings.inputs == ["what is a cell?"]
+    rag.get_embeddings(["chunk one", "chunk two"])
+    (count,) = cache._connection().execute("SELECT COUNT(*) FROM entries").fetchone()
+    assert count == 1
@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+from services import rag, snapshot
+
+SESSION = {"id": 1, "name": "Biology 101", "description": "Cells"}
+
+def add_rows(fake_db, rows=3):
+    fake_db.table("documents").insert([
+        {
+            "content": f"Chunk {idx} — mitochondria ✓",
+            "metadata": {"file_name": "notes.pdf", "page": idx + 1},
+            # Stored as PostgREST returns pgvector columns; values exact in float32
+            "embedding": f"[{idx}.5,0.25,-1.0]",
+            "session_id": 1,
+        }
+        for idx in range(rows)
+    ]).execute()
+
+def export(batch_size=2):
+    return b"".join(snapshot.iter_session_snapshot(SESSION, batch_size=batch_size))
+
+async def _chunks(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+def restore(data, session_id=2, chunk_size=7):
+    return asyncio.run(snapshot.import_session_snapshot(_chunks(data, chunk_size), session_id))
+
+def session_rows(fake_db, session_id):
+    return [row for row in fake_db.table("documents").rows if row.get("session_id") == session_id]
+
+def expect_rejected(data):
+    with pytest.raises(ValueError) as error:
+        restore(data)
+    return str(error.value)
+
+def frame_ends(data):
+    """Offsets just past each frame, i.e. every place a snapshot can be cut cleanly"""
+    ends = []
+    offset = len(snapshot.MAGIC)
+    while offset < len(data):
+        (length,) = snapshot.FRAME_LENGTH.unpack_from(data, offset)
+        offset += snapshot.FRAME_LENGTH.size + length
+        ends.append(offset)
+    return ends
+
+def test_pack_unpack_strings_round_trip():
+    values = ["", "plain", "ünïcødé ✓", "multi\nline"]
+    assert snapshot._unpack_strings(*snapshot._pack_strings(values)) == values
+
+def test_export_import_round_trip(fake_db):
+    add_rows(fake_db, rows=5)
+    result = restore(export())
+    assert result == {"documents_imported": 5, "source_session": {"name": "Biology 101", "description": "Cells"}}
+    originals = session_rows(fake_db, 1)
+    restored = session_rows(fake_db, 2)
+    assert [row["content"] for row in restored] == [row["content"] for row in originals]
+    assert [row["metadata"] for row in restored] == [row["metadata"] for row in originals]
+    assert [row["embedding"] for row in restored] == [rag.parse_embedding(row["embedding"]) for row in originals]
+
+def test_truncated_snapshot_inserts_nothing(fake_db):
+    add_rows(fake_db, rows=5)
+    data = export()
+    assert "Truncated" in expect_rejected(data[:-10])
+    assert session_rows(fake_db, 2) == []
+
+def test_snapshot_cut_on_frame_boundary_inserts_nothing(fake_db):
+    add_rows(fake_db, rows=5)
+    data = export(batch_size=2)
+    # header, three row frames, trailer
+    ends = frame_ends(data)
+    assert len(ends) == 5
+    for end in ends[:-1]:
+        assert "Truncated" in expect_rejected(data[:end])
+    # Dropping a row frame but keeping the trailer is caught by the count
+    (row_frame_start, row_frame_end) = ends[0], ends[1]
+    assert "expected 5" in expect_rejected(data[:row_frame_start] + data[row_frame_end:])
+    assert session_rows(fake_db, 2) == []
+
+def test_frames_after_trailer_are_rejected(fake_db):
+    add_rows(fake_db)
+    data = export()
+    header_end = frame_ends(data)[0]
+    assert "after the trailer" in expect_rejected(data + data[header_end:])
+
+def test_empty_session_round_trips():
+    assert restore(export())["documents_imported"] == 0
+
+def test_wrong_version_is_rejected():
+    header = snapshot._frame({"header": snapshot.np.frombuffer(b'{"version": 99, "session": {}}', dtype=snapshot.np.uint8)})
+    assert "version" in expect_rejected(snapshot.MAGIC + header)
+
+def test_non_object_header_is_rejected():
+    for raw in (b"[]", b"42", b'"text"', b'{"version": 2, "session": null}'):
+        header = snapshot._frame({"header": snapshot.np.frombuffer(raw, dtype=snapshot.np.uint8)})
+        assert "Corrupt" in expect_rejected(snapshot.MAGIC + header)
+
+def test_corrupt_frames_are_rejected(fake_db):
+    add_rows(fake_db)
+    data = export()
+    garbage = snapshot.FRAME_LENGTH.pack(4) + b"junk"
+    assert "Corrupt" in expect_rejected(snapshot.MAGIC + garbage)
+    missing_header = snapshot._frame({"other": snapshot.np.zeros(1)})
+    assert "Corrupt" in expect_rejected(snapshot.MAGIC + missing_header)
+    # A valid header followed by a frame missing its arrays
+    header_end = len(snapshot.MAGIC) + snapshot.FRAME_LENGTH.size + snapshot.FRAME_LENGTH.unpack_from(data, len(snapshot.MAGIC))[0]
+    assert "Corrupt" in expect_rejected(data[:header_end] + missing_header)
+    assert session_rows(fake_db, 2) == []
+
+def test_oversized_frame_length_is_rejected():
+    huge = snapshot.FRAME_LENGTH.pack(snapshot.MAX_FRAME_BYTES + 1)
+    assert "exceeds" in expect_rejected(snapshot.MAGIC + huge)
+
+def test_failed_insert_removes_partial_rows(fake_db, monkeypatch):
+    add_rows(fake_db, rows=5)
+    data = export(batch_size=2)
+    original_insert = snapshot.insert_documents
+    calls = []
+    def flaky_insert(rows):
+        calls.append(rows)
+        if len(calls) == 2:
+            raise RuntimeError("connection reset")
+        return original_insert(rows)
+    monkeypatch.setattr(snapshot, "insert_documents", flaky_insert)
+    with pytest.raises(RuntimeError):
+        restore(data)
+    assert session_rows(fake_db, 2) == []
@@ -0,0 +1,103 @@
+import asyncio
+
+from services import rag
+from services.ingestion import chunk_pages
+
+PAGES = [
+    "Page one introduces cells. " * 60,
+    "Page two covers mitochondria. " * 10,
+    "Page three covers ribosomes. " * 10,
+]
+
+def sync(pages, session_id=1):
+    return asyncio.run(rag.sync_embeddings("notes.pdf", chunk_pages(pages), session_id=session_id))
+
+def stored_rows(fake_db):
+    return fake_db.table("documents").rows
+
+def test_chunk_pages_stays_within_pages():
+    chunks = chunk_pages(PAGES, chunk_size=1000)
+    assert len(chunks) == 4
+    assert chunks[0]["page_hash"] == chunks[1]["page_hash"] != chunks[2]["page_hash"]
+    assert chunks[2]["content"].startswith("Page two") and chunks[3]["content"].startswith("Page three")
+    assert all(len(chunk["content"]) <= 1000 for chunk in chunks)
+
+def test_first_sync_adds_everything(fake_db, fake_ai):
+    assert sync(PAGES) == {"reused": 0, "added": 4, "removed": 0}
+    assert len(fake_ai.embeddings.inputs) == 4
+    assert len(stored_rows(fake_db)) == 4
+
+def test_unchanged_file_embeds_nothing(fake_ai):
+    sync(PAGES)
+    fake_ai.embeddings.inputs.clear()
+    assert sync(PAGES) == {"reused": 4, "added": 0, "removed": 0}
+    assert fake_ai.embeddings.inputs == []
+
+def test_inserted_page_rewrites_nothing(fake_db, fake_ai):
+    sync(PAGES)
+    fake_ai.embeddings.inputs.clear()
+    fake_db.table("documents").calls.clear()
+    revised = ["A new preface page."] + PAGES
+    assert sync(revised) == {"reused": 4, "added": 1, "removed": 0}
+    assert fake_ai.embeddings.inputs == ["A new preface page."]
+    assert "update" not in fake_db.table("documents").calls
+
+def test_long_revision_costs_only_changed_pages(fake_db, fake_ai):
+    book = [f"Page {idx} of the book. " * 40 for idx in range(200)]
+    sync(book)
+    fake_ai.embeddings.inputs.clear()
+    fake_db.table("documents").calls.clear()
+    revised = ["Errata inserted at the front."] + book[:100] + ["Page 100, revised."] + book[101:]
+    result = sync(revised)
+    assert result["added"] == 2 and result["removed"] == 1
+    assert fake_ai.embeddings.inputs == ["Errata inserted at the front.", "Page 100, revised."]
+    # One select page, one insert, one delete: no per-row requests
+    assert fake_db.table("documents").calls == ["select", "insert", "delete"]
+
+def test_edited_page_replaces_only_its_chunks(fake_db, fake_ai):
+    sync(PAGES)
+    fake_ai.embeddings.inputs.clear()
+    revised = [PAGES[0], "Page two now covers chloroplasts.", PAGES[2]]
+    assert sync(revised) == {"reused": 3, "added": 1, "removed": 1}
+    assert fake_ai.embeddings.inputs == ["Page two now covers chloroplasts."]
+    assert len(stored_rows(fake_db)) == 4
+
+def test_rows_without_hashes_are_replaced(fake_db):
+    fake_db.table("documents").insert([
+        {"content": "legacy chunk", "metadata": {"file_name": "notes.pdf"}, "session_id": 1},
+    ]).execute()
+    assert sync(PAGES) == {"reused": 0, "added": 4, "removed": 1}
+
+def test_sync_is_scoped_to_session(fake_db):
+    sync(PAGES, session_id=1)
+    assert sync(PAGES, session_id=2)["added"] == 4
+    assert len(stored_rows(fake_db)) == 8
+
+def test_repeated_pages_are_matched_by_count():
+    pages = [PAGES[1], PAGES[1], PAGES[2]]
+    sync(pages)
+    assert sync(pages) == {"reused": 3, "added": 0, "removed": 0}
+    assert sync([PAGES[1], PAGES[2]]) == {"reused": 2, "added": 0, "removed": 1}
+
+def test_incremental_upload_without_text_is_rejected(fake_db, monkeypatch):
+    from fastapi.testclient import TestClient
+    from main import app
+    from routers import study
+    sync(PAGES)
+    async def no_text(file):
+        return ["", "   "]
+    monkeypatch.setattr(study, "extract_pdf_pages", no_text)
+    response = TestClient(app).post(
+        "/api/study/upload?session_id=1&incremental=true",
+        files={"file": ("notes.pdf", b"%PDF-1.4", "application/pdf")},
+    )
+    assert response.status_code == 400
+    assert len(stored_rows(fake_db)) == 4
+
+def test_store_embeddings_batches_requests(fake_db, fake_ai, monkeypatch):
+    calls = []
+    create = fake_ai.embeddings.create
+    monkeypatch.setattr(fake_ai.embeddings, "create", lambda input, model: calls.append(input) or create(input, model))
+    asyncio.run(rag.store_embeddings("notes.pdf", ["first", "  ", "second"], session_id=1))
+    assert calls == [["first", "second"]]
+    assert [row["content"] for row in stored_rows(fake_db)] == ["first", "second"]
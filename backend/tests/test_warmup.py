@@ -0,0 +1,94 @@
+import asyncio
+import multiprocessing
+
+from fastapi.testclient import TestClient
+
+from main import app
+from services import rag, warmup
+
+VECTORS = [[1.0, 0.0, 0.0], [0.6, 0.8, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]
+
+def add_rows(fake_db, session_id):
+    fake_db.table("documents").insert([
+        {
+            "content": f"chunk {idx}",
+            "metadata": {"file_name": "a.pdf" if idx < 3 else "b.pdf"},
+            "embedding": str(vector),
+            "session_id": session_id,
+        }
+        for idx, vector in enumerate(VECTORS)
+    ]).execute()
+
+def _warm_in_child(fake_db, session_id):
+    add_rows(fake_db, session_id)
+    warmup.warm_session(session_id)
+
+def warm_in_other_worker(fake_db, session_id):
+    # Forked, so the child inherits the patched clients and the shared cache path
+    # but adds its rows to its own copy of the fake database
+    child = multiprocessing.get_context("fork").Process(target=_warm_in_child, args=(fake_db, session_id))
+    child.start()
+    child.join(timeout=30)
+    assert child.exitcode == 0
+
+def test_search_matches_match_documents_semantics(fake_db):
+    add_rows(fake_db, 10)
+    warmup.warm_session(10)
+    results = warmup.search_warm_session(10, [2.0, 0.0, 0.0], match_threshold=0.5, match_count=5)
+    assert [row["content"] for row in results] == ["chunk 0", "chunk 1"]
+    assert [round(row["similarity"], 3) for row in results] == [1.0, 0.6]
+    assert warmup.search_warm_session(10, [2.0, 0.0, 0.0], 0.5, 1)[0]["content"] == "chunk 0"
+
+def test_preload_from_other_worker_is_used(fake_db):
+    warm_in_other_worker(fake_db, 11)
+    # This process never loaded the session itself (nor has its rows)
+    assert 11 not in warmup._warm_sessions
+    results = warmup.search_warm_session(11, [0.0, 1.0, 0.0], 0.5, 5)
+    assert [row["content"] for row in results] == ["chunk 2", "chunk 1"]
+    assert "select" not in fake_db.table("documents").calls
+    status = warmup.warmup_status(11)
+    assert status["warm"] and status["catalog"] == {"a.pdf": 3, "b.pdf": 1}
+
+def test_invalidation_makes_session_cold_everywhere(fake_db, cache):
+    warm_in_other_worker(fake_db, 12)
+    assert warmup.search_warm_session(12, [1.0, 0.0, 0.0], 0.5, 5) is not None
+    cache.invalidate_session(12)
+    assert warmup.search_warm_session(12, [1.0, 0.0, 0.0], 0.5, 5) is None
+
+def test_drop_session_resets_shared_preload(fake_db):
+    warm_in_other_worker(fake_db, 13)
+    warmup.drop_session(13)
+    assert warmup.warmup_status(13)["warm"] is False
+
+def test_session_over_budget_keeps_catalog_only(fake_db, monkeypatch):
+    add_rows(fake_db, 14)
+    monkeypatch.setattr(warmup, "WARMUP_SESSION_MAX_BYTES", 20)
+    warmup.warm_session(14)
+    status = warmup.warmup_status(14)
+    assert status["embeddings_loaded"] is False and status["catalog"] == {"a.pdf": 3, "b.pdf": 1}
+    assert warmup.search_warm_session(14, [1.0, 0.0, 0.0], 0.5, 5) is None
+
+def test_starter_retrievals_are_prefetched(fake_db, fake_ai):
+    add_rows(fake_db, 15)
+    warmup.warm_session(15)
+    assert sorted(fake_ai.embeddings.inputs) == sorted(query for query, _, _ in warmup.STARTER_QUERIES)
+    fake_ai.embeddings.inputs.clear()
+    for query, match_threshold, match_count in warmup.STARTER_QUERIES:
+        docs = asyncio.run(rag.query_documents(query, match_threshold, match_count, session_id=15))
+        assert docs == warmup.search_warm_session(15, [float(len(query)), 1.0, 0.0], match_threshold, match_count)
+    # Answered from the shared cache: no embedding and no match_documents call
+    assert fake_ai.embeddings.inputs == [] and fake_db.rpc_calls == []
+
+def test_catalog_only_session_prefetches_through_match_documents(fake_db, monkeypatch):
+    add_rows(fake_db, 16)
+    fake_db.rpc_results["match_documents"] = [{"id": 1, "content": "chunk 0", "similarity": 0.9}]
+    monkeypatch.setattr(warmup, "WARMUP_SESSION_MAX_BYTES", 20)
+    warmup.warm_session(16)
+    assert len(fake_db.rpc_calls) == len(warmup.STARTER_QUERIES)
+    assert asyncio.run(rag.query_documents("Summarize the key points", session_id=16))[0]["content"] == "chunk 0"
+    assert len(fake_db.rpc_calls) == len(warmup.STARTER_QUERIES)
+
+def test_chat_reports_retrieval_time():
+    response = TestClient(app).post("/api/study/chat", json={"message": "anything?", "session_id": 17})
+    assert response.status_code == 200
+    assert response.headers["Server-Timing"].startswith("retrieval;dur=")
@@ -1,6 +1,6 @@
 "use client";
 
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import ChatInterface from './ChatInterface';
 import FlashcardView from './FlashcardView';
 import { Card, CardContent } from "@/components/ui/card";
@@ -18,6 +18,7 @@ export default function StudySession({ sessionId, onBack }: { sessionId: number;
     const [summary, setSummary] = useState<string>('');
     const [generatingSummary, setGeneratingSummary] = useState(false);
 
+    // Retrievals for these are prefetched on open (STARTER_QUERIES in backend/services/warmup.py)
     const suggestedQuestions = [
         "Summarize the key points",
         "Explain this concept in simple terms",
@@ -25,6 +26,13 @@ export default function StudySession({ sessionId, onBack }: { sessionId: number;
         "What are the main takeaways?",
     ];
 
+    // Opening the session lets the backend warm it up for the first question
+    useEffect(() => {
+        fetch(`http://localhost:8000/api/sessions/${sessionId}`).catch((error) => {
+            console.error('Failed to open session:', error);
+        });
+    }, [sessionId]);
+
     const generateSummary = async () => {
         setGeneratingSummary(true);
         try {